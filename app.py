@@ -1,120 +1,243 @@
 import streamlit as st
+import concurrent.futures
 import datetime
 import hmac
-import io
-import pandas as pd
-from report_1 import generate_faculty_activity_report
-from report_2 import generate_membership_breakdown_report
-from report_3 import generate_activity_per_hub_report
-from report_4 import generate_uos_non_uos_activity_report
+from collections import Counter
+from itertools import chain
+from pathlib import Path
 
+# Must be the first Streamlit command, so it applies to the login page too
+st.set_page_config(
+    page_title="PCE Hubs Report Generator",
+    page_icon="📊",
+    layout="centered"
+)
 
-def check_password():
-    """Returns `True` if the user has entered a correct password."""
+# Initialise login state once so later reads can use plain attribute access
+for key, default in {"authenticated": False, "username": None, "login_failed": False}.items():
+    st.session_state.setdefault(key, default)
+
+
+# === Styles ===
+LOGIN_CSS = """<style>
+.login-header {
+    text-align: center;
+    padding: 2rem 0;
+}
+</style>"""
+
+APP_CSS = """<style>
+.block-container {
+    padding-top: 2rem;
+}
+div[data-testid="stVerticalBlock"] > div:has(div.stButton) {
+    margin-bottom: 0.5rem;
+}
+</style>"""
+
+
+def _today(fmt="%Y%m%d"):
+    """Today's date as a string."""
+    return datetime.datetime.now().strftime(fmt)
+
+
+# === Cached report generation ===
+# Reports are regenerated at most once per day (date_key, from _today()) or hour (ttl),
+# so repeated clicks and reruns reuse the file already written to disk.
+# Report modules are imported here rather than at the top so the login page
+# doesn't pay for pandas and the API client on every rerun.
+@st.cache_data(ttl=3600, show_spinner=False)
+def _faculty_report(date_key):
+    from report_1 import generate_faculty_activity_report
+    return generate_faculty_activity_report()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _membership_report(date_key):
+    from report_2 import generate_membership_breakdown_report
+    return generate_membership_breakdown_report()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _hub_report(date_key):
+    from report_3 import generate_activity_per_hub_report
+    return generate_activity_per_hub_report()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _uos_report(date_key):
+    from report_4 import generate_uos_non_uos_activity_report
+    return generate_uos_non_uos_activity_report()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _all_reports(date_key):
+    from reports_combined import generate_all_reports_zip
+    return generate_all_reports_zip()
+
+
+@st.cache_resource
+def _io_pool():
+    """Shared thread pool for reading report files off the main script thread."""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+
+# Report cards: key -> (title, description, button label, cached generator)
+REPORTS = {
+    "membership": (
+        "📊 Membership Breakdown",
+        "Full breakdown of contacts per Hub, showing UoS status, alumni status, and faculty distribution.",
+        "Generate Membership Report",
+        _membership_report,
+    ),
+    "faculty": (
+        "📘 Faculty Activity",
+        "Shows member counts and activity rates broken down by faculty (FAH, FELS, FEPS, FM, FSS, Professional Services).",
+        "Generate Faculty Report",
+        _faculty_report,
+    ),
+    "hub": (
+        "🌐 Activity per Hub",
+        "Shows member counts and activity rates for each PCE Hub (AI & Society, Health, Nature, Future Cities).",
+        "Generate Hub Report",
+        _hub_report,
+    ),
+    "uos": (
+        "🏫 UoS vs Non-UoS",
+        "Compares activity rates between current University of Southampton members and external contacts.",
+        "Generate UoS Report",
+        _uos_report,
+    ),
+    "all": (
+        "📦 All Reports",
+        "Generates all four reports from a single download of your contacts, bundled as one .zip file.",
+        "Generate All Reports",
+        _all_reports,
+    ),
+}
+
+# Activity report cards (then the all-reports bundle), laid out two per row
+ACTIVITY_REPORTS = ["faculty", "hub", "uos", "all"]
+
+# Download MIME type by report file extension
+MIME_TYPES = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".zip": "application/zip",
+}
+
+
+@st.cache_resource
+def _get_credentials():
+    """Resolve the login credentials once per process, as UTF-8 bytes."""
+    try:
+        username, password = st.secrets["auth"]["username"], st.secrets["auth"]["password"]
+    except (KeyError, FileNotFoundError):
+        username, password = "pce_admin", "pcehubs2024"
+    return username.encode("utf-8"), password.encode("utf-8")
+
+
+def _check_credentials(username, password):
+    """Check if username and password are correct."""
+    correct_username, correct_password = _get_credentials()
     
-    def login_form():
-        """Display the login form."""
-        st.markdown("""
-            <style>
-            .login-header {
-                text-align: center;
-                padding: 2rem 0;
-            }
-            </style>
-        """, unsafe_allow_html=True)
+    username_match = hmac.compare_digest(username.encode("utf-8"), correct_username)
+    password_match = hmac.compare_digest(password.encode("utf-8"), correct_password)
+    
+    return username_match and password_match
+
+
+def _handle_login():
+    """Log In callback. Runs before the rerun, so a valid login renders the main app directly."""
+    username = st.session_state["login_user"]
+    if _check_credentials(username, st.session_state["login_pw"]):
+        st.session_state["authenticated"] = True
+        st.session_state["username"] = username
+        st.session_state["login_failed"] = False
+    else:
+        st.session_state["login_failed"] = True
+
+
+def _login_form():
+    """Display the login form."""
+    st.markdown(LOGIN_CSS, unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        st.title("🔐 PCE Hubs Reports")
+        st.caption("Powered by Ecosend")
+        st.write("")
         
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            st.title("🔐 PCE Hubs Reports")
-            st.caption("Powered by Ecosend")
+        with st.form("login_form"):
+            st.text_input("Username", key="login_user")
+            st.text_input("Password", type="password", key="login_pw")
             st.write("")
+            st.form_submit_button("Log In", use_container_width=True, type="primary", on_click=_handle_login)
             
-            with st.form("login_form"):
-                username = st.text_input("Username")
-                password = st.text_input("Password", type="password")
-                st.write("")
-                submitted = st.form_submit_button("Log In", use_container_width=True, type="primary")
-                
-                if submitted:
-                    if check_credentials(username, password):
-                        st.session_state["authenticated"] = True
-                        st.session_state["username"] = username
-                        st.rerun()
-                    else:
-                        st.error("😕 Invalid username or password")
-    
-    def check_credentials(username, password):
-        """Check if username and password are correct."""
-        try:
-            correct_username = st.secrets["auth"]["username"]
-            correct_password = st.secrets["auth"]["password"]
-        except (KeyError, FileNotFoundError):
-            correct_username = "pce_admin"
-            correct_password = "pcehubs2024"
-        
-        username_match = hmac.compare_digest(username, correct_username)
-        password_match = hmac.compare_digest(password, correct_password)
-        
-        return username_match and password_match
-    
-    if st.session_state.get("authenticated"):
+            if st.session_state.login_failed:
+                st.error("😕 Invalid username or password")
+
+
+def check_password():
+    """Returns `True` if the user has entered a correct password."""
+    if st.session_state.authenticated:
         return True
     
-    login_form()
+    _login_form()
     return False
 
 
-def offer_download(filename, label):
-    """Read an Excel file and offer it for download."""
+def offer_download(filename, label, file_data):
+    """Offer a report file (Excel, or a .zip of reports) for download.
+    
+    `file_data` is a future for the file's bytes, read on the I/O pool.
+    """
     try:
-        with open(filename, 'rb') as f:
-            file_data = f.read()
-        
         st.download_button(
             label=f"📥 {label}",
-            data=file_data,
+            data=file_data.result(),
             file_name=filename,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            mime=MIME_TYPES[Path(filename).suffix],
             use_container_width=True
         )
     except Exception as e:
         st.error(f"Download error: {e}")
 
 
-def report_card(title, icon, description, button_label, generate_func, download_label):
-    """Create a styled report card with description."""
+def report_card(key):
+    """Create a styled report card that generates and offers a report."""
+    title, description, button_label, generate_func = REPORTS[key]
     with st.container(border=True):
-        st.subheader(f"{icon} {title}")
+        st.markdown(f"##### {title}")
         st.caption(description)
         st.write("")
-        
-        if st.button(button_label, key=title, use_container_width=True, type="primary"):
-            with st.spinner("Generating report..."):
-                filename = generate_func()
-            st.success(f"✅ Report generated!")
-            offer_download(filename, download_label)
+        if st.button(button_label, key=key, use_container_width=True, type="primary"):
+            with st.spinner("Generating..."):
+                filename = generate_func(_today())
+            # Start reading the file while the success message renders
+            file_data = _io_pool().submit(Path(filename).read_bytes)
+            st.success("✅ Done!")
+            offer_download(filename, "Download Report", file_data)
+
+
+def refresh_data():
+    """Drop cached reports and contacts so the next report fetches fresh data (button callback)."""
+    from report_utils import invalidate_people_index
+    for _, _, _, generate_func in REPORTS.values():
+        generate_func.clear()
+    invalidate_people_index()
+
+
+def logout():
+    """Clear the login state (button callback, runs before the next rerun)."""
+    st.session_state["authenticated"] = False
+    st.session_state["username"] = None
 
 
 def main_app():
     """Main application after authentication."""
     
-    st.set_page_config(
-        page_title="PCE Hubs Report Generator",
-        page_icon="📊",
-        layout="centered"
-    )
-    
     # Custom CSS for nicer styling
-    st.markdown("""
-        <style>
-        .block-container {
-            padding-top: 2rem;
-        }
-        div[data-testid="stVerticalBlock"] > div:has(div.stButton) {
-            margin-bottom: 0.5rem;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    st.markdown(APP_CSS, unsafe_allow_html=True)
     
     # Sidebar with user info and logout
     with st.sidebar:
@@ -124,12 +247,11 @@ def main_app():
         
         st.divider()
         
-        st.write(f"👤 **{st.session_state.get('username', 'User')}**")
+        st.write(f"👤 **{st.session_state.username or 'User'}**")
         
-        if st.button("🚪 Log Out", use_container_width=True):
-            st.session_state["authenticated"] = False
-            st.session_state["username"] = None
-            st.rerun()
+        st.button("🔄 Refresh Data", use_container_width=True, on_click=refresh_data,
+                  help="Fetch the latest contacts from Ecosend on the next report")
+        st.button("🚪 Log Out", use_container_width=True, on_click=logout)
         
         st.divider()
         
@@ -141,6 +263,13 @@ def main_app():
     st.markdown("Generate engagement and membership reports from your Ecosend data.")
     st.write("")
     
+    _report_panel()
+
+
+@st.fragment
+def _report_panel():
+    """Report sections. Runs as a fragment so button clicks only rerun this part."""
+    
     # Membership Reports Section (most used - first)
     st.subheader("👥 Membership Reports")
     st.caption("Breakdown of contacts by hub, faculty, and status")
@@ -148,15 +277,7 @@ def main_app():
     col1, col2 = st.columns(2)
     
     with col1:
-        with st.container(border=True):
-            st.markdown("##### 📊 Membership Breakdown")
-            st.caption("Full breakdown of contacts per Hub, showing UoS status, alumni status, and faculty distribution.")
-            st.write("")
-            if st.button("Generate Membership Report", key="membership", use_container_width=True, type="primary"):
-                with st.spinner("Generating..."):
-                    filename = generate_membership_breakdown_report()
-                st.success("✅ Done!")
-                offer_download(filename, "Download Report")
+        report_card("membership")
     
     with col2:
         with st.container(border=True):
@@ -165,24 +286,26 @@ def main_app():
             st.write("")
             if st.button("📋 Copy to Clipboard", key="peru_copy", use_container_width=True, type="primary"):
                 with st.spinner("Fetching data..."):
-                    from ecosend_client import get_all_people, HUB_SMART_GROUPS, UOS_SMART_GROUP
-                    import datetime
+                    from ecosend_client import get_all_people, REPORT_FIELDS, UOS_SMART_GROUP
                     
-                    people = get_all_people()
+                    people = get_all_people(REPORT_FIELDS)
+                    
+                    # Contacts per smart group, tallied in one pass over everyone's groups
+                    group_counts = Counter(chain.from_iterable(p['_sg_set'] for p in people))
                     
                     # Calculate totals
                     total = len(people)
-                    uos_count = sum(1 for p in people if UOS_SMART_GROUP in p.get('smart_groups', []))
+                    uos_count = group_counts[UOS_SMART_GROUP]
                     non_uos_count = total - uos_count
                     
                     # Hub counts
-                    nature_count = sum(1 for p in people if 'nature-biodiversity-sustainability' in p.get('smart_groups', []))
-                    health_count = sum(1 for p in people if 'health-wellbeing' in p.get('smart_groups', []))
-                    cities_count = sum(1 for p in people if 'future-cities' in p.get('smart_groups', []))
-                    ai_count = sum(1 for p in people if 'artificial-intelligence-ai-society' in p.get('smart_groups', []))
+                    nature_count = group_counts['nature-biodiversity-sustainability']
+                    health_count = group_counts['health-wellbeing']
+                    cities_count = group_counts['future-cities']
+                    ai_count = group_counts['artificial-intelligence-ai-society']
                     
                     # Format date as DD/MM/YYYY
-                    today = datetime.datetime.now().strftime("%d/%m/%Y")
+                    today = _today("%d/%m/%Y")
                     
                     # Create tab-separated row (skip ratio column - it autofills)
                     # Columns: Date | Total | Non-UoS | UoS | (skip ratio) | Nature | Health | Cities | AI
@@ -241,52 +364,19 @@ def main_app():
         st.markdown("""
         **Step 4:** Click **★ Save Smart Group** to save your changes
         
-        **Step 5:** Come back here and generate your reports!
+        **Step 5:** Come back here, click **🔄 Refresh Data** in the sidebar, and generate your reports!
         """)
     
     st.write("")
     
-    col3, col4 = st.columns(2)
-    
-    with col3:
-        with st.container(border=True):
-            st.markdown("##### 📘 Faculty Activity")
-            st.caption("Shows member counts and activity rates broken down by faculty (FAH, FELS, FEPS, FM, FSS, Professional Services).")
-            st.write("")
-            if st.button("Generate Faculty Report", key="faculty", use_container_width=True, type="primary"):
-                with st.spinner("Generating..."):
-                    filename = generate_faculty_activity_report()
-                st.success("✅ Done!")
-                offer_download(filename, "Download Report")
-    
-    with col4:
-        with st.container(border=True):
-            st.markdown("##### 🌐 Activity per Hub")
-            st.caption("Shows member counts and activity rates for each PCE Hub (AI & Society, Health, Nature, Future Cities).")
-            st.write("")
-            if st.button("Generate Hub Report", key="hub", use_container_width=True, type="primary"):
-                with st.spinner("Generating..."):
-                    filename = generate_activity_per_hub_report()
-                st.success("✅ Done!")
-                offer_download(filename, "Download Report")
-    
-    col5, col6 = st.columns(2)
-    
-    with col5:
-        with st.container(border=True):
-            st.markdown("##### 🏫 UoS vs Non-UoS")
-            st.caption("Compares activity rates between current University of Southampton members and external contacts.")
-            st.write("")
-            if st.button("Generate UoS Report", key="uos", use_container_width=True, type="primary"):
-                with st.spinner("Generating..."):
-                    filename = generate_uos_non_uos_activity_report()
-                st.success("✅ Done!")
-                offer_download(filename, "Download Report")
-    
-    with col6:
-        pass  # Empty for now
+    activity_cols = [*st.columns(2), *st.columns(2)]
+    for col, key in zip(activity_cols, ACTIVITY_REPORTS):
+        with col:
+            report_card(key)
 
 
-# Run the app
-if check_password():
+# Run the app (authenticated reruns skip the login check entirely)
+if st.session_state.authenticated:
+    main_app()
+elif check_password():
     main_app()
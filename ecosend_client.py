@@ -4,9 +4,18 @@ Ecosend/GoSquared API Client
 Shared module for making API calls to Ecosend (built on GoSquared).
 """
 
+import json
 import os
+import sqlite3
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 
 # Try to load dotenv (optional - not needed if using Streamlit secrets)
 try:
@@ -15,6 +24,13 @@ try:
 except ImportError:
     pass  # dotenv not installed, will use Streamlit secrets or env vars
 
+# Use orjson's faster parser for API responses if it's installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads  # stdlib fallback
+
 # === CONFIG (from Streamlit secrets or environment variables) ===
 def get_credentials():
     """Get API credentials from Streamlit secrets or environment."""
@@ -41,6 +57,40 @@ def get_credentials():
 API_KEY, SITE_TOKEN = get_credentials()
 BASE_URL = 'https://api.gosquared.com/people/v1'
 
+# Pagination: page size is the max allowed by the API; pages after the first
+# are fetched this many at a time
+PAGE_LIMIT = 250
+MAX_CONCURRENT_PAGES = 8
+# Per-person feeds fetched at once by get_people_with_email_activity(); each
+# feed pages with its own MAX_CONCURRENT_PAGES window
+MAX_CONCURRENT_FEEDS = 8
+
+# How long get_all_people() results are reused within this process (seconds)
+PEOPLE_CACHE_TTL = 600
+_people_cache = {}  # fields -> (fetched_at, people)
+
+# Shared session, so pages and reports reuse pooled keep-alive HTTPS connections
+# instead of a new TLS handshake per request. Credentials go in the session's
+# default params, sent with every request.
+REQUEST_TIMEOUT = 30  # seconds
+_session = requests.Session()
+# Transient errors (rate limiting, gateway/server errors) are retried with
+# exponential backoff, honouring Retry-After, instead of failing the report
+_retries = Retry(
+    total=6,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=frozenset({'GET'}),
+    respect_retry_after_header=True,
+    raise_on_status=False,  # hand the final response to _make_request's error handling
+)
+# Sized for the most requests in flight at once: concurrent feeds, each paging
+_session.mount('https://', HTTPAdapter(
+    pool_maxsize=MAX_CONCURRENT_FEEDS * MAX_CONCURRENT_PAGES,
+    max_retries=_retries,
+))
+_session.params = {'api_key': API_KEY, 'site_token': SITE_TOKEN}
+
 # Validate that credentials are set
 if not API_KEY or not SITE_TOKEN:
     print("⚠️  Warning: API credentials not set.")
@@ -65,6 +115,10 @@ HUB_SMART_GROUPS = {
     'future-cities': 'Future Cities'
 }
 
+# Slug sets, for intersecting with a person's '_sg_set'
+FACULTY_SLUGS = frozenset(FACULTY_SMART_GROUPS)
+HUB_SLUGS = frozenset(HUB_SMART_GROUPS)
+
 # Reverse mappings (display name -> slug)
 FACULTY_PROPERTIES = {v: k for k, v in FACULTY_SMART_GROUPS.items()}
 HUB_PROPERTIES = {v: k for k, v in HUB_SMART_GROUPS.items()}
@@ -76,6 +130,10 @@ ALUMNI_SMART_GROUP = 'alumni-of-the-uos'
 # Smart group for active users (manually maintained - people who opened emails in last 90 days)
 ACTIVE_SMART_GROUP = 'active-last-90-days'
 
+# Contact fields the reports need; passed as `fields` so the API doesn't send
+# every property of every contact
+REPORT_FIELDS = 'id,email,smart_groups'
+
 # Property for UoS status (fallback from custom properties)
 UOS_STATUS_PROPERTY = 'Do you currently work or study at the UoS?'
 ALUMNI_PROPERTY = 'Alumni'
@@ -85,59 +143,278 @@ def get_since_date():
     return (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=90)).isoformat()
 
 
+# === Local response cache (conditional requests, opt-in) ===
+# Response bodies are stored with their ETag/Last-Modified headers, so a
+# repeat request can be revalidated (304 Not Modified) instead of downloaded
+# again. Kept in SQLite so it survives restarts; any cache error just means
+# the request goes out uncached. Off unless ECOSEND_CACHE_DIR is set, since
+# the cached contact pages hold personal data (emails and smart groups).
+CACHE_DIR = os.getenv('ECOSEND_CACHE_DIR')
+# Cached responses older than this (seconds) are dropped rather than revalidated
+HTTP_CACHE_TTL = 7 * 24 * 60 * 60
+# has_email_activity() results are also kept here, per person, for this long
+# (seconds) unless the person's last_seen changes
+PERSON_CACHE_TTL = 24 * 60 * 60
+_cache_conn = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache_conn():
+    """Open the local SQLite cache (once), creating its tables if needed."""
+    global _cache_conn
+    if _cache_conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(CACHE_DIR, 'cache.sqlite3'), check_same_thread=False)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(http_cache)')]
+        if columns and 'stored_at' not in columns:
+            conn.execute('DROP TABLE http_cache')  # from before entries expired
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS http_cache '
+            '(key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, stored_at REAL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS person_cache '
+            '(key TEXT PRIMARY KEY, last_seen TEXT, checked_at REAL, has_activity INTEGER)'
+        )
+        # Drop expired entries, so the cache doesn't grow without bound
+        conn.execute('DELETE FROM http_cache WHERE stored_at < ?', (time.time() - HTTP_CACHE_TTL,))
+        conn.execute('DELETE FROM person_cache WHERE checked_at < ?', (time.time() - PERSON_CACHE_TTL,))
+        conn.commit()
+        _cache_conn = conn
+    return _cache_conn
+
+
+def _encode_params(params):
+    """Encode query params (sorted, so equal params give an equal query string)."""
+    return urlencode(sorted((params or {}).items()))
+
+
+def _cache_key(endpoint, query):
+    """Cache key for a request: site, endpoint and encoded query string."""
+    return f"{SITE_TOKEN}/{endpoint}?{query}"
+
+
+def _read_cached_response(key):
+    """Get the cached (etag, last_modified, body) for a request, or None."""
+    if not CACHE_DIR:
+        return None
+    try:
+        with _cache_lock:
+            return _get_cache_conn().execute(
+                'SELECT etag, last_modified, body FROM http_cache WHERE key = ? AND stored_at > ?',
+                (key, time.time() - HTTP_CACHE_TTL)
+            ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+
+
+def _store_cached_response(key, resp):
+    """Store a response body if the API gave it a validator."""
+    if not CACHE_DIR:
+        return
+    etag = resp.headers.get('ETag')
+    last_modified = resp.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+    try:
+        with _cache_lock:
+            conn = _get_cache_conn()
+            conn.execute(
+                'INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?)',
+                (key, etag, last_modified, resp.content, time.time())
+            )
+            conn.commit()
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def _person_cache_key(person_id, since_date):
+    """
+    Cache key for a person's activity check: site, person and start day.
+    
+    `since_date` is cut to its day (e.g. get_since_date()'s timestamp), so
+    checks from the same day share an entry.
+    """
+    since_day = str(since_date)[:10] if since_date else ''
+    return f"{SITE_TOKEN}/{person_id}?from={since_day}"
+
+
+def _read_person_activity(key, last_seen):
+    """Get a cached activity result, or None if missing, stale or last_seen has changed."""
+    if not CACHE_DIR:
+        return None
+    try:
+        with _cache_lock:
+            row = _get_cache_conn().execute(
+                'SELECT has_activity FROM person_cache '
+                'WHERE key = ? AND last_seen IS ? AND checked_at > ?',
+                (key, last_seen, time.time() - PERSON_CACHE_TTL)
+            ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+    return bool(row[0]) if row else None
+
+
+def _store_person_activity(key, last_seen, has_activity):
+    """Store an activity result, with the last_seen it was checked against."""
+    if not CACHE_DIR:
+        return
+    try:
+        with _cache_lock:
+            conn = _get_cache_conn()
+            conn.execute(
+                'INSERT OR REPLACE INTO person_cache VALUES (?, ?, ?, ?)',
+                (key, last_seen, time.time(), int(has_activity))
+            )
+            conn.commit()
+    except (sqlite3.Error, OSError):
+        pass
+
+
 def _make_request(endpoint, params=None):
     """Make a GET request to the GoSquared API."""
-    url = f"{BASE_URL}/{endpoint}"
-    if params is None:
-        params = {}
-    params['api_key'] = API_KEY
-    params['site_token'] = SITE_TOKEN
+    return _get_encoded(endpoint, _encode_params(params))
+
+
+def _get_encoded(endpoint, query):
+    """
+    Make a GET request with an already-encoded query string.
     
-    resp = requests.get(url, params=params)
+    Paginated fetches encode their fixed params once per run and reuse the
+    string for every page, rather than having each request rebuild and
+    re-encode a params dict. Credentials still come from the session.
+    """
+    url = f"{BASE_URL}/{endpoint}?{query}" if query else f"{BASE_URL}/{endpoint}"
+    
+    # Revalidate a cached copy rather than downloading it again
+    key = _cache_key(endpoint, query)
+    cached = _read_cached_response(key)
+    headers = {}
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    
+    resp = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    
+    if resp.status_code == 304 and cached:
+        return _json_loads(cached[2])
     
     # Better error handling
     if resp.status_code != 200:
         error_msg = f"API Error {resp.status_code}: {resp.text[:200]}"
         raise Exception(error_msg)
     
-    return resp.json()
+    _store_cached_response(key, resp)
+    return _json_loads(resp.content)
+
+
+def _fetch_page(endpoint, fixed_query, offset):
+    """Fetch a single page of a paginated endpoint, starting at `offset`.
+    
+    `fixed_query` is the encoded query for the params shared by every page.
+    Returns the whole response; the page's items are under 'list'.
+    """
+    limit = f'limit={offset},{PAGE_LIMIT}'
+    return _get_encoded(endpoint, f'{fixed_query}&{limit}' if fixed_query else limit)
+
+
+def _iter_pages(endpoint, params=None):
+    """
+    Yield the pages of a paginated endpoint, in order, as they arrive.
+    
+    The first page is fetched on its own. If it's full, the following pages are
+    fetched concurrently with at most MAX_CONCURRENT_PAGES requests in flight.
+    A new request is only issued as the consumer takes a page, so a slow
+    consumer holds the fetching back rather than pages piling up in memory.
+    If the first response gives the list's 'total', only the offsets below it
+    are requested. Otherwise the first short or empty page marks the end.
+    
+    Args:
+        endpoint: API endpoint (relative to BASE_URL)
+        params: Optional extra query parameters (without 'limit')
+        
+    Yields:
+        Lists of items, one per page
+    """
+    fixed_query = _encode_params(params)
+    first = _fetch_page(endpoint, fixed_query, 0)
+    page = first.get('list', [])
+    yield page
+    if len(page) < PAGE_LIMIT:
+        return
+    
+    total = first.get('total')
+    if not isinstance(total, int):
+        total = None  # unknown: keep requesting until a short page
+    
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PAGES) as pool:
+        pending = deque()
+        next_offset = PAGE_LIMIT
+        
+        def request_next_page():
+            nonlocal next_offset
+            if total is not None and next_offset >= total:
+                return
+            pending.append(pool.submit(_fetch_page, endpoint, fixed_query, next_offset))
+            next_offset += PAGE_LIMIT
+        
+        for _ in range(MAX_CONCURRENT_PAGES):
+            request_next_page()
+        
+        while pending:
+            page = pending.popleft().result().get('list', [])
+            if len(page) < PAGE_LIMIT:
+                # End of the list - anything still pending is past it
+                pending.clear()
+            else:
+                # Keep the window full while the consumer handles this page
+                request_next_page()
+            yield page
+
+
+def _get_all_pages(endpoint, params=None):
+    """Fetch every item from a paginated endpoint, in API order."""
+    return [item for page in _iter_pages(endpoint, params) for item in page]
 
 
 def get_all_people(fields=None):
     """
     Fetch all people (contacts) from Ecosend with pagination.
     
+    Each person is annotated with '_email_lc' (lowercased email, '' if
+    missing) and '_sg_set' (frozenset of smart group slugs). Results are cached
+    in-process for PEOPLE_CACHE_TTL seconds (per `fields`), so reports run
+    back to back share one download. Use invalidate_people_cache() to force
+    a refetch.
+    
     Args:
         fields: Optional comma-separated list of fields to return
         
     Returns:
         List of all people
     """
-    all_people = []
-    offset = 0
-    limit = 250  # Max allowed by API
-    
-    while True:
-        params = {
-            'limit': f'{offset},{limit}'
-        }
-        if fields:
-            params['fields'] = fields
-            
-        data = _make_request('people', params)
-        people = data.get('list', [])
-        
-        if not people:
-            break
-            
-        all_people.extend(people)
-        offset += len(people)
-        
-        # Safety check - if we got less than limit, we've reached the end
-        if len(people) < limit:
-            break
+    cached = _people_cache.get(fields)
+    if cached and time.monotonic() - cached[0] < PEOPLE_CACHE_TTL:
+        return list(cached[1])
     
-    return all_people
+    params = {}
+    if fields:
+        params['fields'] = fields
+    
+    people = _get_all_pages('people', params)
+    for person in people:
+        person['_email_lc'] = (person.get('email') or '').lower()
+        person['_sg_set'] = frozenset(person.get('smart_groups') or ())
+    _people_cache[fields] = (time.monotonic(), people)
+    return list(people)
+
+
+def invalidate_people_cache():
+    """Drop cached contacts so the next get_all_people() call refetches them."""
+    _people_cache.clear()
 
 
 def get_person_feed(person_id, from_date=None, to_date=None, event_type='event'):
@@ -153,33 +430,13 @@ def get_person_feed(person_id, from_date=None, to_date=None, event_type='event')
     Returns:
         List of events
     """
-    all_events = []
-    offset = 0
-    limit = 250
-    
-    while True:
-        params = {
-            'limit': f'{offset},{limit}',
-            'type': event_type
-        }
-        if from_date:
-            params['from'] = from_date
-        if to_date:
-            params['to'] = to_date
-            
-        data = _make_request(f'people/{person_id}/feed', params)
-        events = data.get('list', [])
-        
-        if not events:
-            break
-            
-        all_events.extend(events)
-        offset += len(events)
-        
-        if len(events) < limit:
-            break
+    params = {'type': event_type}
+    if from_date:
+        params['from'] = from_date
+    if to_date:
+        params['to'] = to_date
     
-    return all_events
+    return _get_all_pages(f'people/{person_id}/feed', params)
 
 
 def get_smartgroups():
@@ -198,30 +455,11 @@ def get_smartgroup_people(group_id, fields=None):
     Returns:
         List of people in the smart group
     """
-    all_people = []
-    offset = 0
-    limit = 250
-    
-    while True:
-        params = {
-            'limit': f'{offset},{limit}'
-        }
-        if fields:
-            params['fields'] = fields
-            
-        data = _make_request(f'smartgroups/{group_id}/people', params)
-        people = data.get('list', [])
-        
-        if not people:
-            break
-            
-        all_people.extend(people)
-        offset += len(people)
-        
-        if len(people) < limit:
-            break
+    params = {}
+    if fields:
+        params['fields'] = fields
     
-    return all_people
+    return _get_all_pages(f'smartgroups/{group_id}/people', params)
 
 
 def get_event_types():
@@ -262,14 +500,18 @@ def filter_people_by_custom_property(people, property_name, value=True):
     Returns:
         List of people matching the filter
     """
+    if not isinstance(value, bool):
+        return [p for p in people if p.get('custom', {}).get(property_name) == value]
+    
+    # Handle string 'True'/'False' as well as boolean; real bools skip the str() round trip
+    target = 'true' if value else 'false'
     filtered = []
     for person in people:
-        person_value = get_custom_property(person, property_name)
-        # Handle string 'True'/'False' as well as boolean
-        if isinstance(value, bool):
-            if str(person_value).lower() == str(value).lower():
+        person_value = person.get('custom', {}).get(property_name)
+        if person_value is True or person_value is False:
+            if person_value is value:
                 filtered.append(person)
-        elif person_value == value:
+        elif str(person_value).lower() == target:
             filtered.append(person)
     return filtered
 
@@ -306,13 +548,33 @@ def is_alumni(person):
     return str(value).lower() == 'true' if value else False
 
 
+# Email-related event names, lowercased once. The actual event names may need to
+# be adjusted based on what Ecosend tracks.
+EMAIL_EVENT_NAMES = tuple(e.lower() for e in ['email_open', 'Email Opened', 'Broadcast Opened', 'opened_email', 'open'])
+
+
 def has_email_activity(person, since_date=None):
     """
     Check if a person has any email open activity.
     
-    Note: This checks the person's event feed for email-related events.
-    The actual event names may need to be adjusted based on what Ecosend tracks.
+    Note: This checks the person's event feed for email-related events
+    (see EMAIL_EVENT_NAMES). To check many people, use
+    get_people_with_email_activity() instead.
+    
+    If the local cache is enabled (ECOSEND_CACHE_DIR), results are kept for
+    PERSON_CACHE_TTL per person and start day, so dormant contacts' feeds
+    aren't re-fetched on every run. A change in the person's 'last_seen'
+    invalidates their cached result, but only if 'last_seen' was fetched
+    (REPORT_FIELDS doesn't include it).
     """
+    key = _person_cache_key(person.get('id'), since_date)
+    last_seen = person.get('last_seen')
+    if last_seen is not None:
+        last_seen = str(last_seen)
+    cached = _read_person_activity(key, last_seen)
+    if cached is not None:
+        return cached
+    
     try:
         events = get_person_feed(
             person.get('id'),
@@ -320,18 +582,40 @@ def has_email_activity(person, since_date=None):
             event_type='event'
         )
         
-        # Look for email-related events
-        # Common event names might be: 'Email Opened', 'Broadcast Opened', 'email_open', etc.
-        email_events = ['email_open', 'Email Opened', 'Broadcast Opened', 'opened_email', 'open']
-        
+        has_activity = False
         for event in events:
             event_name = event.get('name', '').lower()
-            if any(e.lower() in event_name for e in email_events):
-                return True
-                
-        return False
+            if any(e in event_name for e in EMAIL_EVENT_NAMES):
+                has_activity = True
+                break
     except Exception:
-        return False
+        return False  # not cached, so the next check tries again
+    
+    _store_person_activity(key, last_seen, has_activity)
+    return has_activity
+
+
+def get_people_with_email_activity(people, since_date=None):
+    """
+    Find which of `people` have any email open activity.
+    
+    The API has no account-wide event feed, so each person's feed is still
+    fetched separately, but up to MAX_CONCURRENT_FEEDS feeds at once instead
+    of one after another. A feed longer than one page fetches its remaining
+    pages with its own window, so up to MAX_CONCURRENT_FEEDS *
+    MAX_CONCURRENT_PAGES requests can be in flight; the session's connection
+    pool is sized for that.
+    
+    Args:
+        people: List of people objects
+        since_date: Optional start date for the feeds
+        
+    Returns:
+        Set of the ids of people with email activity
+    """
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FEEDS) as pool:
+        active = pool.map(lambda person: has_email_activity(person, since_date), people)
+        return {person.get('id') for person, is_active in zip(people, active) if is_active}
 
 
 # === Test connection ===
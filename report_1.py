@@ -6,97 +6,47 @@ Uses Ecosend/GoSquared API with smart_groups.
 """
 
 import datetime
-import pandas as pd
-from ecosend_client import (
-    get_all_people,
-    FACULTY_SMART_GROUPS,
-    ACTIVE_SMART_GROUP
-)
+from ecosend_client import FACULTY_SMART_GROUPS
+from report_utils import export_to_excel, get_people_index, count_active_members
 
 
-def get_list_members():
+def _load_index(index=None):
     """
-    Get all people grouped by faculty using smart_groups.
+    Get all contacts' smart group memberships.
     
-    Returns:
-        Dict mapping faculty display names to sets of email addresses
-    """
-    # Initialize with display names
-    members = {display_name: set() for display_name in FACULTY_SMART_GROUPS.values()}
-    
-    print("Fetching all contacts from Ecosend...")
-    people = get_all_people()
-    print(f"Retrieved {len(people)} contacts.")
-    
-    for person in people:
-        email = person.get('email', '').lower()
-        if not email:
-            continue
-        
-        # Get smart_groups for this person
-        smart_groups = person.get('smart_groups', [])
-        
-        # Check each faculty smart group
-        for slug, display_name in FACULTY_SMART_GROUPS.items():
-            if slug in smart_groups:
-                members[display_name].add(email)
+    Args:
+        index: Optional PeopleIndex already built by the caller; fetched if omitted
     
-    return members, people
-
-
-def get_active_emails(people):
-    """
-    Get emails of people who are in the 'Active (Last 90 Days)' smart group.
-    This smart group is manually maintained in Ecosend.
+    Returns:
+        PeopleIndex of all contacts (memberships and active emails)
     """
-    active_emails = set()
-    
-    for person in people:
-        email = person.get('email', '').lower()
-        if not email:
-            continue
-        
-        smart_groups = person.get('smart_groups', [])
-        if ACTIVE_SMART_GROUP in smart_groups:
-            active_emails.add(email)
-    
-    return active_emails
-
-
-def build_active_faculty_members(faculty_members, active_emails):
-    """Determine which faculty members are active."""
-    active_faculty_members = {faculty: set() for faculty in faculty_members}
-    
-    for faculty, members in faculty_members.items():
-        for email in members:
-            if email in active_emails:
-                active_faculty_members[faculty].add(email)
+    if index is None:
+        print("Fetching all contacts from Ecosend...")
+        index = get_people_index()
+        print(f"Retrieved {len(index.people)} contacts.")
     
-    return active_faculty_members
+    return index
 
 
-def generate_faculty_activity_report(export_path="faculty_activity.xlsx"):
-    """Generate the Faculty Activity Report."""
+def generate_faculty_activity_report(export_path="faculty_activity.xlsx", index=None):
+    """Generate the Faculty Activity Report (from `index` if given, see _load_index)."""
     
     # Get all members by faculty
     print("Getting subscribed members from Ecosend...")
-    faculty_members, all_people = get_list_members()
-    total_members = sum(len(members) for members in faculty_members.values())
+    index = _load_index(index)
+    total_members = index.memberships['slug'].isin(list(FACULTY_SMART_GROUPS)).sum()
     print(f"Found {total_members} faculty-assigned members.")
     
-    # Get active emails
+    # Active emails come from the 'Active (Last 90 Days)' smart group
     print("Analyzing email activity...")
-    active_emails = get_active_emails(all_people)
-    print(f"Found {len(active_emails)} active contacts (last 90 days).")
+    print(f"Found {len(index.active_emails)} active contacts (last 90 days).")
     
-    # Build active faculty members
-    active_faculty_members = build_active_faculty_members(faculty_members, active_emails)
+    # Count total and active members per faculty
+    counts = count_active_members(index.memberships, FACULTY_SMART_GROUPS, index.active_emails)
     
     # Create report data
     report_data = []
-    for faculty, members in faculty_members.items():
-        total = len(members)
-        active = len(active_faculty_members.get(faculty, set()))
+    for faculty, total, active in counts.itertuples():
         pct_active = (active / total * 100) if total > 0 else 0
         report_data.append({
             "Faculty": faculty,
@@ -116,8 +66,7 @@ def generate_faculty_activity_report(export_path="faculty_activity.xlsx"):
     filename_with_date = f"{date_prefix}_faculty_activity.xlsx"
     
     # Write to Excel
-    df = pd.DataFrame(report_data)
-    df.to_excel(filename_with_date, index=False)
+    export_to_excel(report_data, filename_with_date)
     print(f"\n✅ Report exported to: {filename_with_date}")
     
     return filename_with_date
@@ -7,22 +7,35 @@ Uses Ecosend/GoSquared API with smart_groups.
 """
 
 import datetime
-import pandas as pd
+from collections import Counter
 from ecosend_client import (
     get_all_people,
+    REPORT_FIELDS,
     HUB_SMART_GROUPS,
     FACULTY_SMART_GROUPS,
+    HUB_SLUGS,
+    FACULTY_SLUGS,
     UOS_SMART_GROUP,
     ALUMNI_SMART_GROUP
 )
+from report_utils import export_to_excel
 
+# Smart groups counted across all contacts for the "All Hubs" row
+TOTALS_SLUGS = FACULTY_SLUGS | {UOS_SMART_GROUP, ALUMNI_SMART_GROUP}
 
-def generate_membership_breakdown_report():
-    """Generate the Membership Breakdown Report."""
+
+def generate_membership_breakdown_report(people=None):
+    """
+    Generate the Membership Breakdown Report.
+    
+    Args:
+        people: Optional contacts from get_all_people(REPORT_FIELDS); fetched if omitted
+    """
     
-    print("Fetching all contacts from Ecosend...")
-    people = get_all_people()
-    print(f"Retrieved {len(people)} contacts.")
+    if people is None:
+        print("Fetching all contacts from Ecosend...")
+        people = get_all_people(REPORT_FIELDS)
+        print(f"Retrieved {len(people)} contacts.")
     
     # Initialize hub counts structure
     hubs_counts = {
@@ -38,36 +51,37 @@ def generate_membership_breakdown_report():
         for display_name in HUB_SMART_GROUPS.values()
     }
     
+    # Contacts per tracked smart group, for the "All Hubs" row
+    totals = Counter()
+    
     # Process each person
     for person in people:
-        smart_groups = person.get('smart_groups', [])
+        # Set of smart group slugs, so each membership check is O(1)
+        smart_groups = person['_sg_set']
+        totals.update(smart_groups & TOTALS_SLUGS)
         
         # Find which hubs this person is interested in
-        hubs_interested = []
-        for hub_slug, hub_name in HUB_SMART_GROUPS.items():
-            if hub_slug in smart_groups:
-                hubs_interested.append(hub_name)
-                hubs_counts[hub_name]['total'] += 1
+        hubs_interested = [HUB_SMART_GROUPS[hub_slug] for hub_slug in smart_groups & HUB_SLUGS]
+        if not hubs_interested:
+            continue
+        
+        for hub in hubs_interested:
+            hubs_counts[hub]['total'] += 1
         
         # Find which faculties this person belongs to
-        for faculty_slug, faculty_name in FACULTY_SMART_GROUPS.items():
-            if faculty_slug in smart_groups:
-                # Add to faculty count for each hub they're in
-                for hub in hubs_interested:
-                    hubs_counts[hub]['faculties'][faculty_name]['total'] += 1
+        for faculty_slug in smart_groups & FACULTY_SLUGS:
+            # Add to faculty count for each hub they're in
+            faculty_name = FACULTY_SMART_GROUPS[faculty_slug]
+            for hub in hubs_interested:
+                hubs_counts[hub]['faculties'][faculty_name]['total'] += 1
         
         # Check UoS status
-        is_current_uos = UOS_SMART_GROUP in smart_groups
-        if is_current_uos:
-            for hub in hubs_interested:
-                hubs_counts[hub]['current'] += 1
-        else:
-            for hub in hubs_interested:
-                hubs_counts[hub]['non_current'] += 1
+        status = 'current' if UOS_SMART_GROUP in smart_groups else 'non_current'
+        for hub in hubs_interested:
+            hubs_counts[hub][status] += 1
         
         # Check alumni status
-        is_alumni = ALUMNI_SMART_GROUP in smart_groups
-        if is_alumni:
+        if ALUMNI_SMART_GROUP in smart_groups:
             for hub in hubs_interested:
                 hubs_counts[hub]['alumni'] += 1
     
@@ -91,19 +105,19 @@ def generate_membership_breakdown_report():
         }
         report_data.append(hub_data)
     
-    # Calculate "All Hubs" row (totals across all contacts)
+    # "All Hubs" row (totals across all contacts, counted in the main loop)
     all_hubs_row = {
         'PCE Hub': 'All Hubs',
         'Total': len(people),
-        'Non-Current UoS': sum(1 for p in people if UOS_SMART_GROUP not in p.get('smart_groups', [])),
-        'Current UoS': sum(1 for p in people if UOS_SMART_GROUP in p.get('smart_groups', [])),
-        'Alumni': sum(1 for p in people if ALUMNI_SMART_GROUP in p.get('smart_groups', [])),
-        'FAH': sum(1 for p in people if 'fah-faculty-of-arts-humanities' in p.get('smart_groups', [])),
-        'FELS': sum(1 for p in people if 'fels-faculty-of-environmental-life-sciences' in p.get('smart_groups', [])),
-        'FEPS': sum(1 for p in people if 'feps-faculty-of-engineering-physical-sciences' in p.get('smart_groups', [])),
-        'FM': sum(1 for p in people if 'fm-faculty-of-medicine' in p.get('smart_groups', [])),
-        'FSS': sum(1 for p in people if 'fss-faculty-of-social-sciences' in p.get('smart_groups', [])),
-        'PS': sum(1 for p in people if 'professional-services' in p.get('smart_groups', [])),
+        'Non-Current UoS': len(people) - totals[UOS_SMART_GROUP],
+        'Current UoS': totals[UOS_SMART_GROUP],
+        'Alumni': totals[ALUMNI_SMART_GROUP],
+        'FAH': totals['fah-faculty-of-arts-humanities'],
+        'FELS': totals['fels-faculty-of-environmental-life-sciences'],
+        'FEPS': totals['feps-faculty-of-engineering-physical-sciences'],
+        'FM': totals['fm-faculty-of-medicine'],
+        'FSS': totals['fss-faculty-of-social-sciences'],
+        'PS': totals['professional-services'],
         'Report Date': report_date
     }
     report_data.insert(0, all_hubs_row)
@@ -113,8 +127,7 @@ def generate_membership_breakdown_report():
     filename_with_date = f"{date_prefix}_membership_report.xlsx"
     
     # Write to Excel
-    df = pd.DataFrame(report_data)
-    df.to_excel(filename_with_date, index=False)
+    export_to_excel(report_data, filename_with_date)
     
     print(f"\n✅ Report exported to: {filename_with_date}")
     return filename_with_date
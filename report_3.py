@@ -6,87 +6,46 @@ Uses Ecosend/GoSquared API with smart_groups.
 """
 
 import datetime
-import pandas as pd
-from ecosend_client import (
-    get_all_people,
-    HUB_SMART_GROUPS,
-    ACTIVE_SMART_GROUP
-)
+from ecosend_client import HUB_SMART_GROUPS
+from report_utils import export_to_excel, get_people_index, count_active_members, explode_smart_groups
 
 
-def get_list_members():
+def _load_index(index=None):
     """
-    Get all people with their hub interests using smart_groups.
+    Get all contacts' smart group memberships.
     
-    Returns:
-        Dict mapping emails to their data
-    """
-    members = {}
-    
-    print("Fetching all contacts from Ecosend...")
-    people = get_all_people()
-    print(f"Retrieved {len(people)} contacts.")
-    
-    for person in people:
-        email = person.get('email', '').lower()
-        if not email:
-            continue
-        
-        smart_groups = person.get('smart_groups', [])
-        
-        # Get hub interests (using display names)
-        interests = []
-        for hub_slug, hub_name in HUB_SMART_GROUPS.items():
-            if hub_slug in smart_groups:
-                interests.append(hub_name)
-        
-        members[email] = {
-            'interests': interests,
-            'smart_groups': smart_groups
-        }
+    Args:
+        index: Optional PeopleIndex already built by the caller; fetched if omitted
     
-    return members, people
-
-
-def get_active_emails(people):
-    """
-    Get emails of people who are in the 'Active (Last 90 Days)' smart group.
-    This smart group is manually maintained in Ecosend.
+    Returns:
+        PeopleIndex of all contacts (memberships and active emails)
     """
-    active_emails = set()
+    if index is None:
+        print("Fetching all contacts from Ecosend...")
+        index = get_people_index()
+        print(f"Retrieved {len(index.people)} contacts.")
     
-    for person in people:
-        email = person.get('email', '').lower()
-        if not email:
-            continue
-        
-        smart_groups = person.get('smart_groups', [])
-        if ACTIVE_SMART_GROUP in smart_groups:
-            active_emails.add(email)
-    
-    return active_emails
+    return index
 
 
-def generate_activity_per_hub_report(export_path="hub_activity_report.xlsx"):
-    """Generate the Activity per Hub Report."""
+def generate_activity_per_hub_report(export_path="hub_activity_report.xlsx", index=None):
+    """Generate the Activity per Hub Report (from `index` if given, see _load_index)."""
     
     # Get members with interests
-    members, all_people = get_list_members()
+    index = _load_index(index)
     
-    # Get active emails
+    # Active emails come from the 'Active (Last 90 Days)' smart group
     print("Analyzing email activity...")
-    active_emails = get_active_emails(all_people)
-    print(f"Found {len(active_emails)} active contacts (last 90 days).")
+    print(f"Found {len(index.active_emails)} active contacts (last 90 days).")
+    
+    # Count total and active members per hub. An email's hub interests come from
+    # its last contact record, if several contacts share it
+    latest = explode_smart_groups(index.people.drop_duplicates('email', keep='last'))
+    counts = count_active_members(latest, HUB_SMART_GROUPS, index.active_emails)
     
     # Generate summary for each hub
     summary = []
-    for hub_name in HUB_SMART_GROUPS.values():
-        # Get members interested in this hub
-        hub_members = [email for email, data in members.items() if hub_name in data['interests']]
-        active_hub_members = [email for email in hub_members if email in active_emails]
-        
-        total = len(hub_members)
-        active = len(active_hub_members)
+    for hub_name, total, active in counts.itertuples():
         rate = (active / total * 100) if total > 0 else 0
         
         summary.append({
@@ -107,8 +66,7 @@ def generate_activity_per_hub_report(export_path="hub_activity_report.xlsx"):
     filename_with_date = f"{date_prefix}_activity_per_hub.xlsx"
     
     # Write to Excel
-    df = pd.DataFrame(summary)
-    df.to_excel(filename_with_date, index=False)
+    export_to_excel(summary, filename_with_date)
     print(f"\n✅ Report exported to: {filename_with_date}")
     
     return filename_with_date
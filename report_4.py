@@ -6,81 +6,63 @@ Uses Ecosend/GoSquared API with smart_groups.
 """
 
 import datetime
-import pandas as pd
-from ecosend_client import (
-    get_all_people,
-    UOS_SMART_GROUP,
-    ACTIVE_SMART_GROUP
-)
+from ecosend_client import UOS_SMART_GROUP
+from report_utils import export_to_excel, get_people_index
 
 
-def get_list_members():
+def _load_members_by_status(index=None):
     """
     Get all people classified by UoS status using smart_groups.
     
+    Args:
+        index: Optional PeopleIndex already built by the caller; fetched if omitted
+    
     Returns:
-        Dict with 'UOS' and 'Non-UOS' sets of email addresses
+        Tuple of (dict with 'UOS' and 'Non-UOS' sets of email addresses,
+        PeopleIndex of all contacts)
     """
-    members = {"UOS": set(), "Non-UOS": set()}
-    
-    print("Fetching all contacts from Ecosend...")
-    people = get_all_people()
-    print(f"Retrieved {len(people)} contacts.")
-    
-    for person in people:
-        email = person.get('email', '').lower()
-        if not email:
-            continue
-        
-        smart_groups = person.get('smart_groups', [])
-        
-        if UOS_SMART_GROUP in smart_groups:
-            members["UOS"].add(email)
-        else:
-            members["Non-UOS"].add(email)
-    
-    return members, people
+    if index is None:
+        print("Fetching all contacts from Ecosend...")
+        index = get_people_index()
+        print(f"Retrieved {len(index.people)} contacts.")
+    
+    # Classified per contact record: an email shared by a UoS and a non-UoS
+    # contact is in both sets
+    people = index.people[index.people['email'] != '']
+    in_uos = people['smart_groups'].map(lambda groups: UOS_SMART_GROUP in groups)
+    members = {
+        "UOS": set(people.loc[in_uos, 'email']),
+        "Non-UOS": set(people.loc[~in_uos, 'email']),
+    }
+    
+    return members, index
 
 
-def get_active_emails_by_status(people, uos_emails, non_uos_emails):
+def _split_active_by_status(active_emails, uos_emails, non_uos_emails):
     """
     Get active emails classified by UoS status.
     Uses the 'Active (Last 90 Days)' smart group which is manually maintained.
     
+    An email in both sets counts as active UoS only.
+    
     Returns:
         Tuple of (active_uos_emails, active_non_uos_emails)
     """
-    active_uos_emails = set()
-    active_non_uos_emails = set()
-    
-    for person in people:
-        email = person.get('email', '').lower()
-        if not email:
-            continue
-        
-        smart_groups = person.get('smart_groups', [])
-        
-        # Check if person is in the active smart group
-        if ACTIVE_SMART_GROUP in smart_groups:
-            if email in uos_emails:
-                active_uos_emails.add(email)
-            elif email in non_uos_emails:
-                active_non_uos_emails.add(email)
-    
-    return active_uos_emails, active_non_uos_emails
+    active_uos_emails = active_emails & uos_emails
+    return active_uos_emails, (active_emails & non_uos_emails) - uos_emails
 
 
-def generate_uos_non_uos_activity_report(export_path="uos_activity.xlsx"):
-    """Generate the UoS vs Non-UoS Activity Report."""
+def generate_uos_non_uos_activity_report(export_path="uos_activity.xlsx", index=None):
+    """Generate the UoS vs Non-UoS Activity Report (from `index` if given, see _load_members_by_status)."""
     
     # Get members by UoS status
-    members, all_people = get_list_members()
+    members, index = _load_members_by_status(index)
     print(f"List has {len(members['UOS']) + len(members['Non-UOS'])} subscribed members.")
     
     # Get active emails
     print("Analyzing email activity...")
-    active_uos_emails, active_non_uos_emails = get_active_emails_by_status(
-        all_people, members["UOS"], members["Non-UOS"]
+    active_uos_emails, active_non_uos_emails = _split_active_by_status(
+        index.active_emails, members["UOS"], members["Non-UOS"]
     )
     
     # Calculate totals and percentages
@@ -121,8 +103,7 @@ def generate_uos_non_uos_activity_report(export_path="uos_activity.xlsx"):
     filename_with_date = f"{date_prefix}_uos_activity.xlsx"
     
     # Write to Excel
-    df = pd.DataFrame(summary)
-    df.to_excel(filename_with_date, index=False)
+    export_to_excel(summary, filename_with_date)
     print(f"\n✅ Report exported to: {filename_with_date}")
     
     return filename_with_date
@@ -0,0 +1,134 @@
+"""
+Report helpers
+
+Shared pandas aggregation and Excel export for the reports, kept out of
+ecosend_client so the API client itself doesn't need pandas or xlsxwriter.
+"""
+
+import time
+import pandas as pd
+import xlsxwriter
+from dataclasses import dataclass
+from ecosend_client import (
+    get_all_people,
+    invalidate_people_cache,
+    PEOPLE_CACHE_TTL,
+    REPORT_FIELDS,
+    ACTIVE_SMART_GROUP
+)
+
+_index_cache = {}  # fields -> (built_at, PeopleIndex)
+
+
+@dataclass
+class PeopleIndex:
+    """
+    Contacts flattened once into the tables the reports aggregate over.
+    
+    Attributes:
+        people: One row per contact, with 'email' (lowercased, '' if missing)
+            and 'smart_groups' (list of slugs) columns
+        memberships: Unique (email, slug) rows for contacts with an email
+        active_emails: Emails in the 'Active (Last 90 Days)' smart group
+    """
+    people: pd.DataFrame
+    memberships: pd.DataFrame
+    active_emails: set
+    
+    def emails_in(self, slug):
+        """Get the emails of contacts in a smart group."""
+        return set(self.memberships.loc[self.memberships['slug'] == slug, 'email'])
+
+
+def build_people_index(people):
+    """Build a PeopleIndex from a list of people returned by get_all_people()."""
+    df = pd.DataFrame({
+        'email': [person['_email_lc'] for person in people],
+        'smart_groups': [person.get('smart_groups') or [] for person in people],
+    })
+    memberships = explode_smart_groups(df)
+    active_emails = set(memberships.loc[memberships['slug'] == ACTIVE_SMART_GROUP, 'email'])
+    return PeopleIndex(df, memberships, active_emails)
+
+
+def get_people_index(fields=REPORT_FIELDS):
+    """
+    Fetch all people and index them for the reports.
+    
+    The index is cached like get_all_people(), so reports run back to back
+    share both the download and the flattening. Use invalidate_people_index()
+    to force a refetch.
+    """
+    cached = _index_cache.get(fields)
+    if cached and time.monotonic() - cached[0] < PEOPLE_CACHE_TTL:
+        return cached[1]
+    
+    index = build_people_index(get_all_people(fields))
+    _index_cache[fields] = (time.monotonic(), index)
+    return index
+
+
+def explode_smart_groups(people_df):
+    """
+    Flatten a people DataFrame into unique (email, smart group) memberships.
+    
+    Contacts without an email are dropped, as the reports count members by email.
+    
+    Returns:
+        DataFrame with 'email' and 'slug' columns
+    """
+    with_email = people_df[people_df['email'] != '']
+    return (with_email.explode('smart_groups')
+            .dropna(subset=['smart_groups'])
+            .rename(columns={'smart_groups': 'slug'})
+            .drop_duplicates(ignore_index=True))
+
+
+def count_active_members(memberships, group_names, active_emails):
+    """
+    Count total and active members for each smart group in `group_names`.
+    
+    Args:
+        memberships: DataFrame from explode_smart_groups()
+        group_names: Dict mapping smart group slugs to display names
+        active_emails: Set of active email addresses
+        
+    Returns:
+        DataFrame indexed by display name (in `group_names` order) with
+        'total' and 'active' columns
+    """
+    in_groups = memberships[memberships['slug'].isin(list(group_names))]
+    names = in_groups['slug'].map(group_names)
+    is_active = in_groups['email'].isin(active_emails)
+    counts = pd.DataFrame({
+        'total': names.value_counts(),
+        'active': names[is_active].value_counts(),
+    })
+    return counts.reindex(list(group_names.values())).fillna(0).astype(int)
+
+
+def export_to_excel(rows, filename):
+    """
+    Write report rows to an Excel file.
+    
+    Rows are streamed to disk with xlsxwriter's constant_memory mode, one row at
+    a time. Columns follow the order keys first appear in; missing values are
+    left blank.
+    
+    Args:
+        rows: List of dicts, one per spreadsheet row
+        filename: Path of the .xlsx file to write
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    with xlsxwriter.Workbook(filename, {'constant_memory': True}) as workbook:
+        worksheet = workbook.add_worksheet()
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        worksheet.write_row(0, 0, columns, header_format)
+        for row_num, row in enumerate(rows, start=1):
+            worksheet.write_row(row_num, 0, [row.get(column) for column in columns])
+
+
+def invalidate_people_index():
+    """Drop cached contacts and indexes so the next report refetches them."""
+    invalidate_people_cache()
+    _index_cache.clear()
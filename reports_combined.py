@@ -0,0 +1,60 @@
+"""
+All Reports: runs reports 1-4 together
+
+Fetches and indexes all contacts once, then generates the Faculty Activity,
+Membership Breakdown, Activity per Hub and UoS vs Non-UoS reports from that
+single download, optionally bundled into one .zip file.
+Uses Ecosend/GoSquared API with smart_groups.
+"""
+
+import datetime
+import zipfile
+from ecosend_client import get_all_people, REPORT_FIELDS
+from report_utils import build_people_index
+from report_1 import generate_faculty_activity_report
+from report_2 import generate_membership_breakdown_report
+from report_3 import generate_activity_per_hub_report
+from report_4 import generate_uos_non_uos_activity_report
+
+
+def generate_all_reports():
+    """
+    Generate all four reports from one download of the contacts.
+
+    Returns:
+        Dict of report name -> exported filename
+    """
+
+    print("Fetching all contacts from Ecosend...")
+    people = get_all_people(REPORT_FIELDS)
+    index = build_people_index(people)
+    print(f"Retrieved {len(people)} contacts.")
+
+    return {
+        "membership": generate_membership_breakdown_report(people=people),
+        "faculty": generate_faculty_activity_report(index=index),
+        "hub": generate_activity_per_hub_report(index=index),
+        "uos": generate_uos_non_uos_activity_report(index=index),
+    }
+
+
+def generate_all_reports_zip():
+    """Generate all four reports and bundle them into one .zip file."""
+
+    filenames = generate_all_reports()
+
+    # Generate filename with date prefix (YYYYMMDD format for easy sorting)
+    date_prefix = datetime.datetime.now().strftime("%Y%m%d")
+    filename_with_date = f"{date_prefix}_all_reports.zip"
+
+    with zipfile.ZipFile(filename_with_date, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for filename in filenames.values():
+            bundle.write(filename)
+    print(f"\n✅ Reports bundled into: {filename_with_date}")
+
+    return filename_with_date
+
+
+# === RUN ===
+if __name__ == "__main__":
+    generate_all_reports_zip()